@@ -0,0 +1,21 @@
+import numpy
+
+# the array module every op in engine.tensor runs on. numpy by default, cupy can be swapped in with
+# set_backend('cupy') to run the same graph on the gpu, since cupy mirrors numpy's api
+xp = numpy
+
+def set_backend(name: str) -> None:
+    global xp
+
+    if name == 'numpy':
+        xp = numpy
+    elif name == 'cupy':
+        import cupy  # type: ignore  # optional, only needed for the gpu backend
+        xp = cupy
+    else:
+        raise ValueError(f"unknown backend {name!r}, expected 'numpy' or 'cupy'")
+
+    # engine.tensor binds the functions it needs from xp up front, so they have to be rebound now
+    # (imported here since engine.tensor itself imports this module)
+    from engine import tensor
+    tensor._bind_backend(xp)
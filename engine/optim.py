@@ -0,0 +1,26 @@
+from typing import Callable, List
+
+from engine.tensor import Tensor
+
+# plain gradient descent: zero the grads, backprop the loss, move every param against its grad, repeat
+# params are updated in place (same .data array and grad buffer every step) so the loop itself doesnt
+# allocate any new tensors. note that a Tensor built from a numpy array that is already contiguous and in the
+# default dtype shares that array instead of copying it, so the update also writes into the caller's array
+# (pass arr.copy() to keep the original). loss_fn rebuilds the graph from the current params and returns a 0-tensor
+# returns the loss at each step (before that step's update), as plain floats so old graphs can be freed
+def sgd_step(params: List[Tensor], lr: float, loss_fn: Callable[[], Tensor], steps: int = 1) -> List[float]:
+    losses = []
+    for _ in range(steps):
+        for param in params:
+            param.zero_grad()
+
+        loss = loss_fn()
+        loss.backward()
+
+        for param in params:
+            assert param.grad is not None
+            param.data -= lr * param.grad.data
+
+        losses.append(float(loss.data))
+
+    return losses
@@ -1,20 +1,80 @@
 import numpy as np
-from typing import List, NamedTuple, Callable, Optional, Union
+from types import ModuleType
+from typing import Dict, List, NamedTuple, Callable, Optional, Sequence, Tuple, Union
+
+from engine import backend
+
+# everything below runs on xp, the array module picked in engine.backend (numpy unless set_backend says otherwise)
+# the functions the backward pass calls on every edge are also bound once here, so each call is a single global
+# lookup instead of a global lookup plus an attribute lookup on the module. reductions keep using the .sum()
+# method, since np.sum is a python wrapper that ends up calling it anyway
+xp: ModuleType
+_xp_multiply: Callable[..., np.ndarray]
+_xp_add: Callable[..., np.ndarray]
+_xp_negative: Callable[..., np.ndarray]
+_xp_broadcast_to: Callable[..., np.ndarray]
+_xp_expand_dims: Callable[..., np.ndarray]
+
+def _bind_backend(module: ModuleType) -> None:
+    global xp, _xp_multiply, _xp_add, _xp_negative, _xp_broadcast_to, _xp_expand_dims
+
+    xp = module
+    _xp_multiply = module.multiply
+    _xp_add = module.add
+    _xp_negative = module.negative
+    _xp_broadcast_to = module.broadcast_to
+    _xp_expand_dims = module.expand_dims
+    _ones.clear()
+
+# the default grad of 1 for scalar backward() calls, one cached 0-d array per dtype so a training loop
+# doesnt build a new Tensor(1.0) every step. the same array gets handed to every grad_fn downstream (including
+# custom ones passed in through depends_on), so on numpy its made read-only: a grad_fn that writes into its
+# incoming grad fails loudly instead of silently changing the 1 for every later backward()
+_ones: Dict[np.dtype, np.ndarray] = {}
+
+def _one(dtype: np.dtype) -> np.ndarray:
+    one = _ones.get(dtype)
+    if one is None:
+        one = _ones[dtype] = xp.ones((), dtype=dtype)
+        if xp is np:
+            one.flags.writeable = False
+    return one
+
+_bind_backend(backend.xp)
+
+GradFn = Callable[[np.ndarray], np.ndarray]
 
 # each tensor can depend on other tensors. this dependency object records which tensor it depends on
 # and it also has a grad_fn which describes how the gradient should be backpropped
 class Dependency(NamedTuple):
     tensor: 'Tensor'
-    grad_fn: Callable[[np.ndarray], np.ndarray]
+    grad_fn: GradFn
 
 Arrayable = Union[float, list, np.ndarray]
 
+# the float dtype every tensor is stored in. float64 by default so results match plain numpy exactly,
+# set_default_dtype(np.float32) halves the memory traffic and doubles the simd width of every op, at the cost of precision
+DEFAULT_DTYPE: type = np.float64
+
+def set_default_dtype(dtype: type) -> None:
+    global DEFAULT_DTYPE
+    if np.dtype(dtype).kind != 'f':
+        raise ValueError(f"default dtype must be a float dtype, got {np.dtype(dtype)}")
+    DEFAULT_DTYPE = np.dtype(dtype).type
+
 # this is just an helper function that casts floats, lists, etc to numpy array for better internal representation
+# ints (and bools) and other float widths get cast to DEFAULT_DTYPE once here, instead of every op that mixes
+# them allocating a promoted copy. the array is also made C-contiguous, since strided inputs (eg transposed views)
+# keep numpy off its vectorized inner loops
 def ensure_array(arrayable: Arrayable) -> np.ndarray:
-    if isinstance(arrayable, np.ndarray):
-        return arrayable
-    else:
-        return np.array(arrayable)
+    # asarray is a no-op for arrays already on the current backend, and moves anything else onto it
+    arr = xp.asarray(arrayable)
+
+    if arr.dtype.kind != 'c' and arr.dtype != DEFAULT_DTYPE:
+        arr = arr.astype(DEFAULT_DTYPE)
+
+    # ascontiguousarray would turn 0-tensors into shape (1,), asarray with order='C' keeps them as is
+    return xp.asarray(arr, order='C')
 
 Tensorable = Union['Tensor', float, np.ndarray]
 
@@ -24,21 +84,58 @@ def ensure_tensor(tensorable: Tensorable) -> 'Tensor':
     else:
         return Tensor(tensorable)
 
+# returns every tensor reachable from root such that each tensor comes after all the tensors it depends on
+# uses an explicit stack instead of recursion so deep graphs dont hit python's recursion limit
+def _build_topo(root: 'Tensor') -> List['Tensor']:
+    order: List['Tensor'] = []
+    visited = {id(root)}
+    stack = [(root, iter(root._dep_tensors))]
+
+    while stack:
+        node, deps = stack[-1]
+        for child in deps:
+            if id(child) not in visited:
+                visited.add(id(child))
+                stack.append((child, iter(child._dep_tensors)))
+                break
+        else:
+            # all children are done, so this node can be emitted
+            stack.pop()
+            order.append(node)
+
+    return order
+
 class Tensor:
     # def __init__(self, data: Arrayable, requires_grad: bool = False, depends_on: List[Dependency] = None) -> None:
-    def __init__(self, data: Arrayable, requires_grad: bool = False, depends_on: Optional[List[Dependency]] = None) -> None:
+    # the ops pass their dependencies straight in as _dep_tensors/_dep_grad_fns, depends_on is there for outside callers
+    def __init__(self, data: Arrayable, requires_grad: bool = False, depends_on: Optional[List[Dependency]] = None,
+                 _dep_tensors: Sequence['Tensor'] = (), _dep_grad_fns: Sequence[GradFn] = ()) -> None:
         self.data = ensure_array(data)
         self.requires_grad = requires_grad
-        self.depends_on = depends_on or []
+        # the dependencies are stored as two parallel lists (tensors, grad_fns) rather than a list of Dependency
+        # tuples, so the backward loop can zip them without an attribute lookup per edge
+        if depends_on:
+            _dep_tensors = [dependency.tensor for dependency in depends_on]
+            _dep_grad_fns = [dependency.grad_fn for dependency in depends_on]
+        self._dep_tensors = _dep_tensors
+        self._dep_grad_fns = _dep_grad_fns
         self.shape = self.data.shape
+        # the grad buffer is allocated lazily, on the first zero_grad() or backward pass that reaches this tensor,
+        # so tensors that never get backpropped through dont pay for it
         self.grad: Optional['Tensor'] = None
 
-        if self.requires_grad:
-            self.zero_grad()
-
     # clears the gradient to zeros. useful before reusing the tensor in a new backward pass
+    # the buffer is reused when it still matches the data, so a training loop zeroes it in place every step
     def zero_grad(self) -> None:
-        self.grad = Tensor(np.zeros_like(self.data, dtype=np.float64))
+        if self.grad is None or self.grad.data.shape != self.data.shape:
+            self.grad = Tensor(xp.zeros_like(self.data))
+        else:
+            self.grad.data.fill(0.0)
+
+    # the dependencies as Dependency tuples, same as what was passed in
+    @property
+    def depends_on(self) -> List[Dependency]:
+        return [Dependency(t, grad_fn) for t, grad_fn in zip(self._dep_tensors, self._dep_grad_fns)]
 
     # clean string representation similar to that of numpy or pytorch
     def __repr__(self) -> str:
@@ -91,17 +188,40 @@ class Tensor:
 
         if grad is None:
             if self.shape == ():
-                grad = Tensor(1.0) # if no grad is supplied and the tensor is a scalar, it defaults to 1
+                self._backward_arr(_one(self.data.dtype)) # if no grad is supplied and the tensor is a scalar, it defaults to 1
             else:
                 raise RuntimeError("grad must be specified for non-0-tensor")
-
-        assert self.grad is not None
-        self.grad.data += grad.data # accumulates the gradient (important for branches in computational graph)
-
-        # recursively calls backward() on all dependencies, using their grad_fn to compute appropriate local gradients
-        for dependency in self.depends_on:
-            backward_grad = dependency.grad_fn(grad.data)
-            dependency.tensor.backward(Tensor(backward_grad))
+        else:
+            self._backward_arr(grad.data)
+
+    # the actual backward pass. everything in here works on raw numpy arrays, the Tensor wrapping
+    # only happens at the user facing backward() above, never per edge
+    def _backward_arr(self, grad_arr: np.ndarray) -> None:
+        # instead of recursing into every dependency (which re-walks shared subgraphs like x*x once per path)
+        # we sort the graph once and call each grad_fn exactly once, accumulating grads per node as we go
+        grads = {id(self): grad_arr}
+        for node in reversed(_build_topo(self)):
+            node_grad = grads.pop(id(node))
+
+            if node.grad is None and node_grad.shape == node.data.shape:
+                # first grad to reach this tensor, so the buffer starts out as a copy of it instead of zeros plus an add
+                node.grad = Tensor(node_grad.astype(node.data.dtype, order='C', casting='same_kind'))
+            else:
+                if node.grad is None:
+                    node.zero_grad()
+                assert node.grad is not None
+                # accumulates the gradient (important for branches in computational graph)
+                # explicit ufunc call with out=, same casting rule as +=. same_kind still allows narrowing within a kind
+                # (a float64 grad into a float32 buffer can overflow to inf), it only refuses eg complex into float
+                _xp_add(node.grad.data, node_grad, out=node.grad.data, casting='same_kind')
+
+            for dep_tensor, grad_fn in zip(node._dep_tensors, node._dep_grad_fns):
+                backward_grad = grad_fn(node_grad)
+                key = id(dep_tensor)
+                if key in grads:
+                    grads[key] = grads[key] + backward_grad
+                else:
+                    grads[key] = backward_grad
 
     # a wrapper function that delegates to a function style of tensor_sum
     def sum(self) -> 'Tensor':
@@ -116,106 +236,182 @@ def tensor_sum(t: Tensor) -> Tensor:
     if requires_grad:
         # creates a grad_fn that maps the incoming scalar gradient back to the original shape
         # why this works: d(sum)/d(element) = 1, so gradient is broadcasted
+        # broadcast_to gives a read-only view with zero strides, so no array of ones gets built here
         def grad_fn(grad: np.ndarray) -> np.ndarray:
-            return grad * np.ones_like(t.data)
+            return _xp_broadcast_to(grad, t.shape)
 
-        depends_on = [Dependency(t, grad_fn)]
+        dep_tensors, dep_grad_fns = [t], [grad_fn]
 
     else:
-        depends_on = []
+        dep_tensors, dep_grad_fns = [], []
 
     # constructs the new scalar tensor, carrying the necessary backward metadata
-    return Tensor(data, requires_grad, depends_on)
+    return Tensor(data, requires_grad, _dep_tensors=dep_tensors, _dep_grad_fns=dep_grad_fns)
+
+# handling broadcasting: works out (once, while building the graph) how a grad of the broadcasted output shape
+# gets summed back down to the input's shape, so the backward pass doesnt redo the axis scan every call
+# returns None when the shapes already match, which is the usual elementwise case and needs no reduction at all
+def _reducer(shape: tuple, out_shape: tuple) -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    if shape == out_shape:
+        return None
+
+    axes = _reduce_axes(shape, out_shape)
+
+    def reduce_grad(grad: np.ndarray) -> np.ndarray:
+        # keepdims leaves the added dims as leading 1s, reshape just drops them (its a view, no copy)
+        return grad.sum(axis=axes, keepdims=True).reshape(shape)
+
+    return reduce_grad
+
+# training loops rebuild the same graph every step, so the axis scan for a given (shape, out_shape) pair is
+# memoized here and shared by every graph that hits it
+_reduce_plans: Dict[Tuple[tuple, tuple], tuple] = {}
+
+def _reduce_axes(shape: tuple, out_shape: tuple) -> tuple:
+    axes = _reduce_plans.get((shape, out_shape))
+    if axes is None:
+        ndims_added = len(out_shape) - len(shape)
+        # summing added dims, plus the broadcasted (but not added) dims
+        # eg: (2,3) + (1,3) => (2,3) grad(2,3)
+        # all the reduced axes go into a single sum call instead of one numpy call (and one temp array) per axis
+        axes = tuple(range(ndims_added)) + tuple(ndims_added + i for i, dim in enumerate(shape) if dim == 1)
+        _reduce_plans[(shape, out_shape)] = axes
+    return axes
+
+def _identity(grad: np.ndarray) -> np.ndarray:
+    return grad
 
 def _add(t1: Tensor, t2: Tensor) -> Tensor:
     data = t1.data + t2.data
     requires_grad = t1.requires_grad or t2.requires_grad
-    depends_on: List[Dependency] = []
+    dep_tensors: List[Tensor] = []
+    dep_grad_fns: List[GradFn] = []
 
     # idea: [1,2,3] + [4+e,5,6] = [5+e,7,9]
     # this basically means we get the same grad back in addition
-    # but this doesnt handle broadcasting properly
-
-    # handling broadcasting
-    def reduce_grad(grad: np.ndarray, shape: tuple) -> np.ndarray:
-        ndims_added = grad.ndim - len(shape)
-        for _ in range(ndims_added): # summing added dims
-            grad = grad.sum(axis=0)
-        # summing across broadcastd (but not added dims)
-        # eg: (2,3) + (1,3) => (2,3) grad(2,3)
-        for i, dim in enumerate(shape):
-            if dim == 1:
-                grad = grad.sum(axis=i, keepdims=True)
-        return grad
+    # but this doesnt handle broadcasting properly, so the grad gets reduced back to each input's shape
 
     if t1.requires_grad:
-        def grad_fn1(grad: np.ndarray) -> np.ndarray:
-            return reduce_grad(grad, t1.shape)
-        depends_on.append(Dependency(t1, grad_fn1))
+        dep_tensors.append(t1)
+        dep_grad_fns.append(_reducer(t1.shape, data.shape) or _identity)
 
     if t2.requires_grad:
-        def grad_fn2(grad: np.ndarray) -> np.ndarray:
-            return reduce_grad(grad, t2.shape)
-        depends_on.append(Dependency(t2, grad_fn2))
+        dep_tensors.append(t2)
+        dep_grad_fns.append(_reducer(t2.shape, data.shape) or _identity)
 
-    return Tensor(data, requires_grad, depends_on)
+    return Tensor(data, requires_grad, _dep_tensors=dep_tensors, _dep_grad_fns=dep_grad_fns)
 
 def _mul(t1: Tensor, t2: Tensor) -> Tensor:
   # y = a*b
   # we know: dL/dy
   # dL/da = dL/dy * dy/da = dL/dy * b
 
-  data = t1.data * t2.data
+  data = _xp_multiply(t1.data, t2.data)
   requires_grad = t1.requires_grad or t2.requires_grad
-  depends_on: List[Dependency] = []
+  dep_tensors: List[Tensor] = []
+  dep_grad_fns: List[GradFn] = []
 
   if t1.requires_grad:
-    def grad_fn1(grad: np.ndarray) -> np.ndarray:
-      grad = grad * t2.data
+    reduce1 = _reducer(t1.shape, data.shape)
+    if reduce1 is None:
+      def grad_fn1(grad: np.ndarray) -> np.ndarray:
+        return _xp_multiply(grad, t2.data)
+    else:
+      def grad_fn1(grad: np.ndarray) -> np.ndarray:
+        return reduce1(_xp_multiply(grad, t2.data))
 
-      # Sum out added dims
-      ndims_added = grad.ndim - t1.data.ndim
-      for _ in range(ndims_added):
-        grad = grad.sum(axis=0)
+    dep_tensors.append(t1)
+    dep_grad_fns.append(grad_fn1)
 
-      # Sum across broadcasted (but non-added dims)
-      for i, dim in enumerate(t1.shape):
-        if dim == 1:
-          grad = grad.sum(axis=i, keepdims=True)
+  if t2.requires_grad:
+    reduce2 = _reducer(t2.shape, data.shape)
+    if reduce2 is None:
+      def grad_fn2(grad: np.ndarray) -> np.ndarray:
+        return _xp_multiply(grad, t1.data)
+    else:
+      def grad_fn2(grad: np.ndarray) -> np.ndarray:
+        return reduce2(_xp_multiply(grad, t1.data))
 
-      return grad
+    dep_tensors.append(t2)
+    dep_grad_fns.append(grad_fn2)
 
-    depends_on.append(Dependency(t1, grad_fn1))
+  return Tensor(data, requires_grad, _dep_tensors=dep_tensors, _dep_grad_fns=dep_grad_fns)
 
-  if t2.requires_grad:
-    def grad_fn2(grad: np.ndarray) -> np.ndarray:
-      grad = grad * t1.data
+def _neg(t: Tensor) -> Tensor:
+    data = -t.data
+    requires_grad = t.requires_grad
+    if requires_grad:
+        dep_tensors, dep_grad_fns = [t], [lambda x: -x]
+    else:
+        dep_tensors, dep_grad_fns = [], []
 
-      # Sum out added dims
-      ndims_added = grad.ndim - t2.data.ndim
-      for _ in range(ndims_added):
-        grad = grad.sum(axis=0)
+    return Tensor(data, requires_grad, _dep_tensors=dep_tensors, _dep_grad_fns=dep_grad_fns)
 
-      # Sum across broadcasted (but non-added dims)
-      for i, dim in enumerate(t2.shape):
-        if dim == 1:
-          grad = grad.sum(axis=i, keepdims=True)
+# same as t1 + -t2, but without building the negated t2 (and an extra graph node) in the forward pass
+def _sub(t1: Tensor, t2: Tensor) -> Tensor:
+    data = t1.data - t2.data
+    requires_grad = t1.requires_grad or t2.requires_grad
+    dep_tensors: List[Tensor] = []
+    dep_grad_fns: List[GradFn] = []
 
-      return grad
+    # d(a-b)/da = 1 and d(a-b)/db = -1, with the same broadcasting reduction as add
+    if t1.requires_grad:
+        dep_tensors.append(t1)
+        dep_grad_fns.append(_reducer(t1.shape, data.shape) or _identity)
 
-    depends_on.append(Dependency(t2, grad_fn2))
+    if t2.requires_grad:
+        reduce2 = _reducer(t2.shape, data.shape) or _identity
+        def grad_fn2(grad: np.ndarray) -> np.ndarray:
+            return _xp_negative(reduce2(grad))
+        dep_tensors.append(t2)
+        dep_grad_fns.append(grad_fn2)
 
-  return Tensor(data, requires_grad, depends_on)
+    return Tensor(data, requires_grad, _dep_tensors=dep_tensors, _dep_grad_fns=dep_grad_fns)
 
-def _neg(t: Tensor) -> Tensor:
-    data = -t.data
+# fused (t*t).sum(): one pass over the data and a single graph node instead of a mul and a sum
+# d(sum of squares)/dt = 2*t, so we dont need to keep the t*t buffer around for the backward pass
+def sum_sq(t: Tensor) -> Tensor:
+    flat = t.data.ravel()
+    data = xp.dot(flat, flat)
     requires_grad = t.requires_grad
+
     if requires_grad:
-        depends_on = [Dependency(t, lambda x: -x)]
+        def grad_fn(grad: np.ndarray) -> np.ndarray:
+            return (2.0 * grad) * t.data
+
+        dep_tensors, dep_grad_fns = [t], [grad_fn]
+
     else:
-        depends_on = []
+        dep_tensors, dep_grad_fns = [], []
 
-    return Tensor(data, requires_grad, depends_on)
+    return Tensor(data, requires_grad, _dep_tensors=dep_tensors, _dep_grad_fns=dep_grad_fns)
 
-def _sub(t1: Tensor, t2: Tensor) -> Tensor:
-    return t1 + -t2
+# dot product over the last axis, (broadcasting over the leading ones like numpy does)
+# fuses the elementwise multiply and the reduction into a single einsum call
+def dot(t1: Tensor, t2: Tensor) -> Tensor:
+    data = xp.einsum('...i,...i->...', t1.data, t2.data)
+    requires_grad = t1.requires_grad or t2.requires_grad
+    dep_tensors: List[Tensor] = []
+    dep_grad_fns: List[GradFn] = []
+
+    # y = sum_i a_i*b_i => dL/da_i = dL/dy * b_i
+    # the incoming grad has the output shape (one less dim), so it gets a trailing axis to broadcast against b
+    # einsum also broadcasts a size-1 contracted axis, eg (2,1).(3,), so the product is broadcast out to the full
+    # product_shape before reducing, otherwise it can come out narrower than what the reducer was planned for
+    product_shape = np.broadcast_shapes(t1.shape, t2.shape)
+
+    if t1.requires_grad:
+        reduce1 = _reducer(t1.shape, product_shape) or _identity
+        def grad_fn1(grad: np.ndarray) -> np.ndarray:
+            return reduce1(_xp_broadcast_to(_xp_multiply(_xp_expand_dims(grad, -1), t2.data), product_shape))
+        dep_tensors.append(t1)
+        dep_grad_fns.append(grad_fn1)
+
+    if t2.requires_grad:
+        reduce2 = _reducer(t2.shape, product_shape) or _identity
+        def grad_fn2(grad: np.ndarray) -> np.ndarray:
+            return reduce2(_xp_broadcast_to(_xp_multiply(_xp_expand_dims(grad, -1), t1.data), product_shape))
+        dep_tensors.append(t2)
+        dep_grad_fns.append(grad_fn2)
+
+    return Tensor(data, requires_grad, _dep_tensors=dep_tensors, _dep_grad_fns=dep_grad_fns)
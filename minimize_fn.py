@@ -1,18 +1,14 @@
 # minimizing a function using our tiny autograd
 
-from engine.tensor import Tensor
+from engine.tensor import Tensor, sum_sq
+from engine.optim import sgd_step
 
 x = Tensor([11, -19, 7, -1, 2, 13], requires_grad=True)
 
 # minimizing the sum of squares
-for i in range(100):
-    x.zero_grad() # before inplace ops we were creating new tensors each time so we were zeroing the grads automatically but now we do it manually
-
-    sum_of_squares = (x * x).sum()  # is a 0-tensor
-    sum_of_squares.backward()
-    # x -= 0.1 * x.grad
-    delta_x = 0.1 * x.grad
-    # x = Tensor(x.data - delta_x.data, requires_grad=True)
-    x -= delta_x
+# sgd_step zeroes x.grad, backprops sum_sq(x) and updates x in place every step, so x keeps its identity
+# and grad buffer across all 100 iterations
+losses = sgd_step([x], lr=0.1, loss_fn=lambda: sum_sq(x), steps=100)  # sum_sq(x) is (x * x).sum() but fused
 
+for i, sum_of_squares in enumerate(losses):
     print(i, sum_of_squares)
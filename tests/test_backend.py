@@ -0,0 +1,55 @@
+import unittest
+import pytest
+import numpy as np
+
+from engine import backend, tensor
+from engine.tensor import Tensor
+
+class TestBackend(unittest.TestCase):
+    def test_numpy_backend(self):
+        backend.set_backend('numpy')
+        assert backend.xp is np
+
+        t1 = Tensor([1, 2, 3], requires_grad=True)
+        t2 = (t1 * t1).sum()
+        t2.backward()
+
+        assert isinstance(t1.data, np.ndarray)
+        assert t1.grad.data.tolist() == [2, 4, 6]
+
+    def test_set_backend_rebinds_tensor(self):
+        # clobber what engine.tensor has bound, set_backend has to put it back
+        tensor.xp = None
+        tensor._xp_multiply = None
+
+        backend.set_backend('numpy')
+
+        assert tensor.xp is np
+        assert tensor._xp_multiply is np.multiply
+        assert tensor._xp_add is np.add
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            backend.set_backend('tpu')
+
+        assert backend.xp is np
+
+    def test_cupy_backend(self):
+        cupy = pytest.importorskip('cupy')
+
+        backend.set_backend('cupy')
+        try:
+            assert tensor.xp is cupy
+            assert tensor._xp_multiply is cupy.multiply
+
+            t1 = Tensor([[1, 2, 3], [4, 5, 6]], requires_grad=True)  # (2, 3)
+            t2 = Tensor([7, 8, 9], requires_grad=True)               # (3,)
+            t3 = (t1 * t2).sum()
+            t3.backward()
+
+            assert isinstance(t1.data, cupy.ndarray)
+            assert t3.data.tolist() == 172
+            assert t1.grad.data.tolist() == [[7, 8, 9], [7, 8, 9]]
+            assert t2.grad.data.tolist() == [5, 7, 9]
+        finally:
+            backend.set_backend('numpy')
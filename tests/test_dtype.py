@@ -0,0 +1,39 @@
+import unittest
+import pytest
+import numpy as np
+
+from engine.tensor import Tensor, set_default_dtype
+
+class TestDtype(unittest.TestCase):
+    def test_default_dtype(self):
+        t1 = Tensor([1, 2, 3], requires_grad=True)
+        assert t1.data.dtype == np.float64
+
+    def test_float32(self):
+        set_default_dtype(np.float32)
+        try:
+            t1 = Tensor([1, 2, 3], requires_grad=True)
+            t2 = (t1 * t1).sum()
+            t2.backward()
+
+            assert t1.data.dtype == np.float32
+            assert t2.data.dtype == np.float32
+            assert t1.grad.data.dtype == np.float32
+            assert t1.grad.data.tolist() == [2, 4, 6]
+        finally:
+            set_default_dtype(np.float64)
+
+    def test_non_float_dtype(self):
+        with pytest.raises(ValueError):
+            set_default_dtype(np.int32)
+
+        assert Tensor([1, 2, 3]).data.dtype == np.float64
+
+    def test_complex_mul(self):
+        t1 = Tensor(np.array([1 + 2j]), requires_grad=True)
+        t2 = Tensor(np.array([2j]), requires_grad=True)
+
+        t3 = t1 * t2
+
+        assert t3.data.dtype == np.complex128
+        assert t3.data.tolist() == [-4 + 2j]
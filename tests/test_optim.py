@@ -0,0 +1,17 @@
+import unittest
+import numpy as np
+
+from engine.tensor import Tensor, sum_sq
+from engine.optim import sgd_step
+
+class TestOptim(unittest.TestCase):
+    def test_sgd_step(self):
+        x = Tensor([1, 2, 3], requires_grad=True)
+        data = x.data
+
+        losses = sgd_step([x], lr=0.1, loss_fn=lambda: sum_sq(x), steps=2)
+
+        # grad is 2x, so every step is x := x - 0.2x = 0.8x
+        np.testing.assert_array_almost_equal(losses, [14, 14 * 0.8 ** 2])
+        np.testing.assert_array_almost_equal(x.data, [0.64, 1.28, 1.92])
+        assert x.data is data # updated in place
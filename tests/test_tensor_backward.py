@@ -0,0 +1,68 @@
+import unittest
+import pytest
+
+from engine.tensor import Tensor, Dependency
+
+class TestTensorBackward(unittest.TestCase):
+    def test_shared_subexpression(self):
+        # x is used twice in x*x and y is reused on both sides of y+y
+        # each path has to contribute its own gradient
+        x = Tensor([1, 2, 3], requires_grad=True)
+        y = x * x
+        z = (y + y).sum()
+
+        z.backward()
+
+        assert x.grad.data.tolist() == [4, 8, 12]
+        assert y.grad.data.tolist() == [2, 2, 2]
+
+    def test_deep_chain(self):
+        # a long chain of ops used to recurse once per node
+        x = Tensor([1, 2, 3], requires_grad=True)
+        y = x
+        for _ in range(5000):
+            y = y + 1
+
+        y.sum().backward()
+
+        assert x.grad.data.tolist() == [1, 1, 1]
+
+    def test_zero_grad(self):
+        x = Tensor([1, 2, 3], requires_grad=True)
+        assert x.grad is None # allocated lazily
+
+        x.sum().backward()
+        grad = x.grad
+        assert grad.data.tolist() == [1, 1, 1]
+
+        x.zero_grad() # clears the same buffer instead of allocating a new one
+        assert x.grad is grad
+        assert x.grad.data.tolist() == [0, 0, 0]
+
+    def test_repeated_backward(self):
+        # the first grad to reach a tensor becomes its buffer, so it has to be a copy
+        # otherwise the second pass would accumulate into the shared default grad of 1
+        x = Tensor([1, 2, 3], requires_grad=True)
+        y = x.sum()
+
+        y.backward()
+        y.backward()
+
+        assert y.grad.data.tolist() == 2
+        assert x.grad.data.tolist() == [2, 2, 2]
+
+    def test_default_grad_is_read_only(self):
+        # a grad_fn that writes into its incoming grad must not be able to change the shared default grad of 1
+        def grad_fn(grad):
+            grad *= 2
+            return grad
+
+        x = Tensor(3., requires_grad=True)
+        y = Tensor(x.data, True, [Dependency(x, grad_fn)])
+
+        with pytest.raises(ValueError):
+            y.backward()
+
+        z = x.sum()
+        z.backward()
+        assert z.grad.data.tolist() == 1
@@ -0,0 +1,67 @@
+import unittest
+
+from engine.tensor import Tensor, sum_sq, dot
+
+class TestTensorDot(unittest.TestCase):
+    def test_sum_sq(self):
+        t1 = Tensor([1, 2, 3], requires_grad=True)
+        t2 = sum_sq(t1) # 1 + 4 + 9
+
+        assert t2.data.tolist() == 14
+
+        t2.backward()
+
+        assert t1.grad.data.tolist() == [2, 4, 6] # d(sum of squares)/dx = 2x
+
+    def test_simple_dot(self):
+        t1 = Tensor([1, 2, 3], requires_grad=True)
+        t2 = Tensor([4, 5, 6], requires_grad=True)
+
+        t3 = dot(t1, t2)
+
+        assert t3.data.tolist() == 32
+
+        t3.backward(Tensor(2))
+
+        assert t1.grad.data.tolist() == [8, 10, 12]
+        assert t2.grad.data.tolist() == [2, 4, 6]
+
+    def test_broadcast_dot(self):
+        t1 = Tensor([[1, 2, 3], [4, 5, 6]], requires_grad = True)  # (2, 3)
+        t2 = Tensor([7, 8, 9], requires_grad = True)               # (3,)
+
+        t3 = dot(t1, t2)   # shape (2,)
+
+        assert t3.data.tolist() == [50, 122]
+
+        t3.backward(Tensor([1, 1]))
+
+        assert t1.grad.data.tolist() == [[7, 8, 9], [7, 8, 9]]
+        assert t2.grad.data.tolist() == [5, 7, 9]
+
+    def test_broadcast_contracted_axis(self):
+        # einsum broadcasts a size-1 contracted axis, (2, 1) . (3,) => [2*(1+2+3), 3*(1+2+3)]
+        t1 = Tensor([[2], [3]], requires_grad = True)   # (2, 1)
+        t2 = Tensor([1, 2, 3], requires_grad = True)     # (3,)
+
+        t3 = dot(t1, t2)   # shape (2,)
+
+        assert t3.data.tolist() == [12, 18]
+
+        t3.backward(Tensor([1, 1]))
+
+        assert t1.grad.data.tolist() == [[6], [6]]
+        assert t2.grad.data.tolist() == [5, 5, 5]
+
+    def test_broadcast_contracted_axis2(self):
+        t1 = Tensor([[2], [3]], requires_grad = True)   # (2, 1)
+        t2 = Tensor([[1, 2, 3]], requires_grad = True)   # (1, 3)
+
+        t3 = dot(t1, t2)   # shape (2,)
+
+        assert t3.data.tolist() == [12, 18]
+
+        t3.backward(Tensor([1, 2]))
+
+        assert t1.grad.data.tolist() == [[6], [12]]
+        assert t2.grad.data.tolist() == [[8, 8, 8]]